@@ -1,8 +1,16 @@
 import os
 import pickle
+from functools import lru_cache
 from typing import Any, Union, Dict
 import yaml
 
+try:
+    # libyaml-backed loader is ~10x faster than the pure-Python tokenizer;
+    # fall back when the C extension is not available.
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 import pandas as pd
 
 from utils.ml_logging import get_logger
@@ -10,22 +18,36 @@ from utils.ml_logging import get_logger
 # Set up logging
 logger = get_logger()
 
-def _load_config(self, config_file: str) -> Dict[str, Any]:
+
+@lru_cache(maxsize=32)
+def _load_config_cached(config_path: str, mtime: float) -> Dict[str, Any]:
+    """
+    Parse a YAML file, memoized on (absolute path, mtime) so unchanged
+    files are only parsed once per process.
+    """
+    with open(config_path, "r") as file:
+        return yaml.load(file, Loader=_YamlLoader)
+
+
+def load_config(config_file: str) -> Dict[str, Any]:
     """
     Load the configuration file.
 
+    Repeated loads of an unmodified file are served from an in-process
+    cache; editing the file invalidates the cached entry via its mtime.
+
     Args:
         config_file (str): Path to the YAML configuration file.
 
     Returns:
         Dict[str, Any]: Configuration dictionary.
     """
-    if not os.path.exists(config_file):
-        self.logger.error(f"Configuration file {config_file} not found.")
+    config_path = os.path.abspath(config_file)
+    if not os.path.exists(config_path):
+        logger.error(f"Configuration file {config_file} not found.")
         return {}
 
-    with open(config_file, "r") as file:
-        return yaml.safe_load(file)
+    return _load_config_cached(config_path, os.path.getmtime(config_path))
 
 
 
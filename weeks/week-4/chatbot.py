@@ -1,10 +1,16 @@
 import os
+import hashlib
 import logging
 import asyncio
+import threading
 import time
+from datetime import datetime, timezone
+from functools import lru_cache
 from typing import List, Optional, Tuple
 
+import numpy as np
 import streamlit as st
+from bson.binary import Binary, BinaryVectorDtype, VECTOR_SUBTYPE
 from pymongo import MongoClient
 from pymongo.collection import Collection
 from azure.core.credentials import AzureKeyCredential
@@ -24,6 +30,19 @@ from src.aoai.aoai_helper import AzureOpenAIManager
 # Load environment variables from your .env file
 load_dotenv(".env")
 
+# Read configuration once at import time. os.getenv on the hot path is a
+# needless per-call lookup, and resolving everything here surfaces a
+# misconfigured deployment at startup instead of mid-conversation.
+AZURE_OPENAI_KEY = os.getenv('AZURE_OPENAI_KEY')
+AZURE_OPENAI_API_VERSION = os.getenv('AZURE_OPENAI_API_VERSION', "2023-05-15")
+AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT')
+AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv('AZURE_OPENAI_EMBEDDING_DEPLOYMENT')
+AZURE_OPENAI_CHAT_DEPLOYMENT_ID = os.getenv('AZURE_OPENAI_CHAT_DEPLOYMENT_ID')
+AZURE_AI_SEARCH_SERVICE_ENDPOINT = os.getenv("AZURE_AI_SEARCH_SERVICE_ENDPOINT")
+AZURE_SEARCH_INDEX_NAME = os.getenv("AZURE_SEARCH_INDEX_NAME", "lab-ai-index")
+AZURE_AI_SEARCH_ADMIN_KEY = os.getenv("AZURE_AI_SEARCH_ADMIN_KEY")
+AZURE_SEARCH_SEMANTIC_CONFIG_NAME = os.getenv("AZURE_SEARCH_SEMANTIC_CONFIG_NAME", None)
+
 # Set up logging so we can see what's happening in the terminal/logs
 logging.basicConfig(
     level=logging.INFO,
@@ -66,6 +85,12 @@ def initialize_session_state() -> None:
         try:
             st.session_state["cosmosdb_manager"] = initialize_cosmosdb_manager()
             logger.info("Connected to CosmosDB (Mongo API).")
+            # Bulk-load existing cache entries into the in-process index so
+            # the first lookup of the session is already local. The dict is
+            # created here, on the script thread, and handed to the worker
+            # threads that refresh and scan it later.
+            st.session_state["cache_index"] = _empty_cache_index()
+            _refresh_cache_index(st.session_state["cosmosdb_manager"], st.session_state["cache_index"])
         except Exception as e:
             logger.error(f"Failed to connect to CosmosDB: {e}")
             st.error("Failed to connect to the database. Please check your configuration.")
@@ -75,11 +100,11 @@ def initialize_session_state() -> None:
     if "azure_openai_client_4o" not in st.session_state:
         try:
             st.session_state["azure_openai_client_4o"] = AzureOpenAIManager(
-                api_key=os.getenv('AZURE_OPENAI_KEY'),
-                api_version=os.getenv('AZURE_OPENAI_API_VERSION', "2023-05-15"),
-                azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
-                embedding_model_name=os.getenv('AZURE_OPENAI_EMBEDDING_DEPLOYMENT'),
-                completion_model_name=os.getenv('AZURE_OPENAI_CHAT_DEPLOYMENT_ID'),
+                api_key=AZURE_OPENAI_KEY,
+                api_version=AZURE_OPENAI_API_VERSION,
+                azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                embedding_model_name=AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+                completion_model_name=AZURE_OPENAI_CHAT_DEPLOYMENT_ID,
             )
             logger.info("Azure OpenAI Manager initialized.")
         except Exception as e:
@@ -91,9 +116,9 @@ def initialize_session_state() -> None:
     if "search_client" not in st.session_state:
         try:
             st.session_state["search_client"] = SearchClient(
-                endpoint=os.getenv("AZURE_AI_SEARCH_SERVICE_ENDPOINT"),
-                index_name=os.getenv("AZURE_SEARCH_INDEX_NAME", "lab-ai-index"),
-                credential=AzureKeyCredential(os.getenv("AZURE_AI_SEARCH_ADMIN_KEY")),
+                endpoint=AZURE_AI_SEARCH_SERVICE_ENDPOINT,
+                index_name=AZURE_SEARCH_INDEX_NAME,
+                credential=AzureKeyCredential(AZURE_AI_SEARCH_ADMIN_KEY),
             )
             logger.info("Azure Search Client initialized.")
         except Exception as e:
@@ -123,18 +148,63 @@ def initialize_session_state() -> None:
             st.session_state[key] = value
             logger.info(f"Initialized '{key}' with default value.")
 
-def initialize_cosmosdb_manager() -> Collection:
+    # Kick off the connection warm-up once per session, in the background,
+    # so the first real query doesn't pay the cold-start costs.
+    if not st.session_state.get("warmup_started"):
+        st.session_state["warmup_started"] = True
+        threading.Thread(
+            target=_warmup,
+            args=(
+                st.session_state["search_client"],
+                st.session_state["azure_openai_client_4o"],
+                st.session_state["cosmosdb_manager"],
+            ),
+            daemon=True,
+        ).start()
+
+def _warmup(search_client: SearchClient, openai_manager: AzureOpenAIManager, collection: Collection) -> None:
     """
-    Connect to MongoDB (CosmosDB) using credentials from environment variables,
-    and return a reference to a specific Collection in the database.
+    Pre-pay the one-time costs of the first real user turn: the first TLS
+    handshake to Azure Search and Azure OpenAI, and the first MongoDB
+    command. Runs in a background thread so startup isn't blocked; each
+    probe failing is logged but never fatal.
+    """
+    try:
+        list(search_client.search(search_text="warmup", top=1))
+        logger.info("Warmed up Azure Search connection.")
+    except Exception as e:
+        logger.warning(f"Search warmup failed: {e}")
+    try:
+        openai_manager.generate_embedding("warmup")
+        logger.info("Warmed up Azure OpenAI embeddings connection.")
+    except Exception as e:
+        logger.warning(f"Embeddings warmup failed: {e}")
+    try:
+        collection.database.command("ping")
+        logger.info("Warmed up MongoDB connection.")
+    except Exception as e:
+        logger.warning(f"MongoDB warmup failed: {e}")
+    try:
+        # Exercise the similarity-scan kernel once so BLAS thread-pool
+        # and dispatch initialization don't land on the first real turn.
+        dummy = np.ones((4, 8), dtype=np.float32)
+        (dummy @ dummy[0]).argmax()
+        logger.info("Warmed up the similarity-scan kernel.")
+    except Exception as e:
+        logger.warning(f"Similarity kernel warmup failed: {e}")
+
+@lru_cache(maxsize=1)
+def _get_mongo_client() -> MongoClient:
+    """
+    Build the connection string and MongoClient once per process.
+    Client construction is expensive (TLS handshake, topology
+    discovery), and Streamlit reruns would otherwise repeat it whenever
+    session state is cleared; lru_cache makes it a process singleton.
     """
     COSMOS_MONGO_USER = os.environ.get('COSMOS_MONGO_USER')
     COSMOS_MONGO_PWD = os.environ.get('COSMOS_MONGO_PWD')
     COSMOS_MONGO_SERVER = os.environ.get('COSMOS_MONGO_SERVER')
 
-    DB_NAME = 'ExampleDB'
-    COLLECTION_NAME = "ExampleCollection"
-
     # If any required environment variable is missing, throw an error
     if not all([COSMOS_MONGO_USER, COSMOS_MONGO_PWD, COSMOS_MONGO_SERVER]):
         logger.error("MongoDB environment variables are not fully set.")
@@ -151,43 +221,269 @@ def initialize_cosmosdb_manager() -> Collection:
         + "?tls=true&authMechanism=SCRAM-SHA-256&retrywrites=false&maxIdleTimeMS=120000"
     )
 
-    mongo_client = MongoClient(connection_str)
-    db = mongo_client[DB_NAME]
+    # tz_aware so created_at comes back offset-aware; the cache mirror
+    # compares it against an aware UTC sentinel.
+    return MongoClient(connection_str, maxPoolSize=50, socketTimeoutMS=5000, tz_aware=True)
 
-    # Create the collection if it doesn't exist yet
-    if COLLECTION_NAME not in db.list_collection_names():
-        db.create_collection(COLLECTION_NAME)
-        logger.info(f"Created collection '{COLLECTION_NAME}'.")
-    else:
-        logger.info(f"Using existing collection: '{COLLECTION_NAME}'.")
+def initialize_cosmosdb_manager() -> Collection:
+    """
+    Connect to MongoDB (CosmosDB) using the process-wide client,
+    and return a reference to a specific Collection in the database.
+    """
+    DB_NAME = 'ExampleDB'
+    COLLECTION_NAME = "ExampleCollection"
+    EMBEDDING_CACHE_COLLECTION_NAME = "embedding_cache"
+
+    db = _get_mongo_client()[DB_NAME]
+
+    # Mongo creates collections lazily on first insert, so there's no need
+    # to enumerate every collection in the DB just to pre-create this one.
+    collection = db[COLLECTION_NAME]
+
+    # Expire cached answers after a week so the cache (and the vector index
+    # scanning it) doesn't grow without bound. TTL indexes only fire on BSON
+    # dates, which is why created_at is stored as a datetime.
+    #
+    # The vector index itself is created on the Cosmos (Mongo vCore) side;
+    # it should be defined as:
+    #   name: "VectorSearchIndex", key: {"queryVector": "cosmosSearch"},
+    #   cosmosSearchOptions: {kind: "vector-ivf", numLists: 100,
+    #                         similarity: "COS", dimensions: <embedding dims>}
+    # with dimensions matching the embedding deployment (e.g. 3072 for
+    # text-embedding-3-large).
+    try:
+        collection.create_index("created_at", expireAfterSeconds=CACHE_ENTRY_TTL_SECONDS)
+        logger.info("Ensured TTL index on 'created_at'.")
+    except Exception as e:
+        logger.warning(f"Could not ensure TTL index on 'created_at': {e}")
 
-    return db[COLLECTION_NAME]
+    # A second, content-hash-keyed collection caches raw query embeddings
+    # across sessions and processes, with the same TTL policy.
+    embedding_cache = db[EMBEDDING_CACHE_COLLECTION_NAME]
+    try:
+        embedding_cache.create_index("created_at", expireAfterSeconds=CACHE_ENTRY_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Could not ensure TTL index on the embedding cache: {e}")
+    st.session_state["embedding_cache_collection"] = embedding_cache
+
+    return collection
+
+# ----------------------------- #
+#       In-Process Cache Index  #
+# ----------------------------- #
+
+# How often (seconds) we poll MongoDB for cache entries written by other
+# sessions. Between refreshes every cache lookup is a local numpy scan.
+CACHE_INDEX_REFRESH_SECONDS = 30
+
+# How long cached answers live in MongoDB before the TTL monitor drops them.
+CACHE_ENTRY_TTL_SECONDS = 7 * 24 * 3600
+
+def _quantize_embedding(vector: List[float]) -> Optional[Tuple[Binary, float]]:
+    """
+    Pack an fp32 embedding as unit-normalized int8 — roughly 4x smaller
+    than a BSON array of doubles, which is what every cached entry used
+    to carry over the wire and on disk. The vector is scaled by its own
+    max-abs component so the full int8 range is used, and that per-vector
+    scale is returned alongside the payload for exact reconstruction.
+    """
+    v = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(v))
+    if norm == 0.0:
+        return None
+    v = v / norm
+    scale = float(np.max(np.abs(v))) / 127.0
+    if scale == 0.0:
+        return None
+    q = np.clip(np.round(v / scale), -128, 127).astype(np.int8)
+    # BSON vector binary (subtype 9) is the PyMongo 4.10+ native vector
+    # encoding, which the driver serializes in one pass instead of
+    # per-element.
+    return Binary.from_vector(q.tolist(), BinaryVectorDtype.INT8), scale
+
+def _dequantize_embedding(data: bytes, scale: Optional[float] = None) -> np.ndarray:
+    """
+    Inverse of _quantize_embedding: int8 payload back to ~unit float32.
+    Entries written before per-vector scales were stored used a fixed
+    1/127 factor, so that's the fallback when scale is missing.
+    """
+    if scale is None:
+        scale = 1.0 / 127.0
+    if isinstance(data, Binary) and data.subtype == VECTOR_SUBTYPE:
+        return np.asarray(data.as_vector().data, dtype=np.float32) * scale
+    # Entries written before the vector-binary migration: raw int8 bytes.
+    return np.frombuffer(data, dtype=np.int8).astype(np.float32) * scale
+
+def _empty_cache_index() -> dict:
+    """A fresh, unpopulated in-process mirror of the response cache."""
+    return {
+        "vectors": [],        # list of np.float32 query vectors
+        "entries": [],        # parallel list of {"response", "sources"}
+        "matrix": None,       # stacked unit-norm vectors, rebuilt after additions
+        "last_created_at": datetime.fromtimestamp(0, tz=timezone.utc),
+        "refreshed_at": 0.0,
+    }
+
+def _refresh_cache_index(collection: Collection, index: Optional[dict]) -> Optional[dict]:
+    """
+    Keep an in-memory copy of the cached (queryVector, response, sources)
+    rows so cache lookups run locally instead of issuing a $vectorSearch
+    round-trip per turn. New rows are pulled incrementally by `created_at`
+    at most once every CACHE_INDEX_REFRESH_SECONDS.
+
+    The index dict is created on the script thread (see
+    initialize_session_state) and passed in, because this refresh runs on
+    worker threads that can't see Streamlit's session state; it is
+    mutated in place. Returns the index, or None if it is missing or
+    MongoDB could not be reached.
+    """
+    try:
+        if index is None:
+            return None
+        now = time.monotonic()
+        if now - index["refreshed_at"] < CACHE_INDEX_REFRESH_SECONDS:
+            return index
+
+        cursor = collection.find(
+            {"created_at": {"$gt": index["last_created_at"]}},
+            {"queryVector": 1, "scale": 1, "response": 1, "sources": 1, "created_at": 1},
+        ).sort("created_at", 1)
+
+        added = 0
+        for doc in cursor:
+            vector = doc.get("queryVector")
+            if isinstance(vector, (bytes, Binary)):
+                # Current entries: int8-quantized binary.
+                vector = _dequantize_embedding(vector, doc.get("scale"))
+            elif vector:
+                # Legacy entries stored as a plain float array.
+                vector = np.asarray(vector, dtype=np.float32)
+            else:
+                continue
+            index["vectors"].append(vector)
+            index["entries"].append({
+                "response": doc.get("response"),
+                "sources": doc.get("sources"),
+            })
+            created_at = doc.get("created_at") or index["last_created_at"]
+            index["last_created_at"] = max(index["last_created_at"], created_at)
+            added += 1
+
+        if added:
+            _rebuild_matrix(index)
+            logger.info(f"Cache index refreshed with {added} new entries ({len(index['entries'])} total).")
+        index["refreshed_at"] = now
+        return index
+    except Exception as e:
+        logger.error(f"Failed to refresh the in-process cache index: {e}")
+        return None
+
+def _rebuild_matrix(index: dict) -> None:
+    """
+    Re-stack the cached vectors into a C-contiguous float32 matrix with
+    L2-normalized rows. Normalizing once at build time means the
+    similarity scan below is a bare BLAS matmul — no per-query division
+    by row norms — which only gets cheaper as the cache grows.
+    """
+    matrix = np.ascontiguousarray(np.vstack(index["vectors"]), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    index["matrix"] = matrix / (norms + 1e-12)
+
+def _best_cached_match(matrix: np.ndarray, query_unit: np.ndarray) -> Tuple[int, float]:
+    """
+    Cosine-rank every cached vector against the unit-norm query in one
+    matmul and return (row index, score) of the best candidate.
+    """
+    scores = matrix @ query_unit
+    best = int(np.argmax(scores))
+    return best, float(scores[best])
+
+def _append_cache_entry(index: Optional[dict], query_vector: List[float], response: str, sources: List[str]) -> None:
+    """
+    Add a freshly stored response to the local index so this session can
+    hit it immediately, without waiting for the next MongoDB refresh.
+    The index is passed in (not read from session state) because stores
+    run on worker threads.
+    """
+    if index is None:
+        return
+    index["vectors"].append(np.asarray(query_vector, dtype=np.float32))
+    index["entries"].append({"response": response, "sources": sources})
+    _rebuild_matrix(index)
 
 # ----------------------------- #
 #         Helper Functions      #
 # ----------------------------- #
 
-def generate_embeddings(text: str) -> List[float]:
+@lru_cache(maxsize=512)
+def _embed_text(text: str, cache: Optional[Collection], openai_manager: AzureOpenAIManager) -> np.ndarray:
+    """
+    Resolve the embedding for the given text: the shared Mongo embedding
+    cache first (keyed by content hash, so repeat prompts across sessions
+    skip the model), then the embeddings API on a miss. The collection
+    and manager come in as arguments — this runs on worker threads, which
+    can't see Streamlit's session state — and participate in the memo key.
+    Memoized so repeated identical queries within a process don't even
+    reach Mongo; raising on API failure keeps errors out of the cache.
+    """
+    key = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+    if cache is not None:
+        try:
+            doc = cache.find_one({"_id": key})
+            if doc and doc.get("vector") is not None:
+                stored = doc["vector"]
+                if isinstance(stored, (bytes, Binary)):
+                    return np.frombuffer(stored, dtype=np.float32).copy()
+                # Entries written before the binary migration: float array.
+                return np.asarray(stored, dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+
+    embedding_response = openai_manager.generate_embedding(text)
+    vector = np.asarray(embedding_response.data[0].embedding, dtype=np.float32)
+
+    if cache is not None:
+        try:
+            # Raw float32 bytes: one Binary blob instead of ~1536 BSON
+            # doubles, so the encoder doesn't touch per-float objects and
+            # the document is ~8x smaller.
+            cache.replace_one(
+                {"_id": key},
+                {"vector": Binary(vector.tobytes()), "created_at": datetime.now(timezone.utc)},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+    return vector
+
+def generate_embeddings(text: str, openai_manager: AzureOpenAIManager, embedding_cache: Optional[Collection] = None) -> np.ndarray:
     """
     Generate a vector embedding for the given text using Azure OpenAI embeddings.
     Embeddings are typically used for semantic search or similarity comparisons.
+
+    Returned as a float32 ndarray (4 B/element vs ~28 B for a Python
+    float list) so downstream math and BSON encoding stay cheap; callers
+    that need a plain list convert with .tolist() at the API boundary.
     """
     try:
-        embedding_response = st.session_state["azure_openai_client_4o"].generate_embedding(text)
-        return embedding_response.data[0].embedding
+        return _embed_text(text, embedding_cache, openai_manager)
     except Exception as e:
         logger.error(f"Error generating embedding: {e}")
-        return []
+        return np.empty(0, dtype=np.float32)
 
-def retrieve_documents_from_azure_ai_search(query: str) -> List[dict]:
+def retrieve_documents_from_azure_ai_search(query: str, search_client: SearchClient) -> List[dict]:
     """
     Talk to Azure Cognitive Search with the given query,
     and return up to 5 relevant documents (with content + metadata).
+    The client is passed in because this runs on worker threads, which
+    can't see Streamlit's session state.
     """
     try:
-        search_client = st.session_state["search_client"]
-        semantic_config = os.getenv("AZURE_SEARCH_SEMANTIC_CONFIG_NAME", None)
+        semantic_config = AZURE_SEARCH_SEMANTIC_CONFIG_NAME
 
+        # Only the chunk text and its parent document path are consumed
+        # below, so project just those fields instead of pulling the full
+        # indexed payload for every hit.
         if semantic_config:
             # If we have semantic configuration, perform a semantic search
             results = search_client.search(
@@ -197,11 +493,14 @@ def retrieve_documents_from_azure_ai_search(query: str) -> List[dict]:
                 query_caption="extractive",
                 query_answer="extractive",
                 semantic_configuration_name=semantic_config,
+                select=["chunk", "parent_path"],
             )
             logger.info("Performed semantic search.")
         else:
             # Otherwise, just do a keyword-based search
-            results = search_client.search(search_text=query, top=5)
+            results = search_client.search(
+                search_text=query, top=5, select=["chunk", "parent_path"]
+            )
             logger.info("Performed keyword search.")
 
         docs = []
@@ -222,15 +521,29 @@ def retrieve_documents_from_azure_ai_search(query: str) -> List[dict]:
         st.error("Failed to retrieve documents. Please try again later.")
         return []
 
-async def generate_llm_response(query: str, context: List[str]) -> str:
+# Cap each retrieved chunk at this many characters before it goes into
+# the prompt, so a handful of oversized documents can't blow the model's
+# input budget.
+MAX_CONTEXT_CHARS_PER_CHUNK = 4000
+
+def stream_llm_response(query: str, context: List[str]):
     """
-    Calls AzureOpenAIManager to produce a chat-based response. 
-    We feed the documents' content as "Context" and the user query as "User Query."
+    Calls Azure OpenAI to produce a chat-based response, yielding token
+    deltas as they arrive instead of waiting for the full completion.
+    We feed the documents' content as "Context" and the user query as
+    "User Query"; the UI shows the first tokens immediately, which cuts
+    the perceived latency dramatically for long answers.
     """
     try:
+        # Join the chunks with a visible separator instead of interpolating
+        # the list itself — list repr adds quotes, escapes, and bracket
+        # syntax the model has to pay input tokens for.
+        context_str = "\n\n---\n\n".join(
+            chunk[:MAX_CONTEXT_CHARS_PER_CHUNK] for chunk in context
+        )
         prompt = f"""
         Context:
-        {context}
+        {context_str}
 
         User Query:
         {query}
@@ -240,179 +553,334 @@ async def generate_llm_response(query: str, context: List[str]) -> str:
         - If insufficient information, respond with "I'm sorry, I don't have enough information."
         """
 
-        logger.info("Generating AI response...")
+        logger.info("Generating AI response (streaming)...")
         logger.debug(f"User Prompt: {prompt}")
 
-        # We ask the manager to generate a chat response from the prompt
-        # stream=False means we wait for the full response rather than streaming tokens
-        response = await st.session_state["azure_openai_client_4o"].generate_chat_response(
-            query=prompt,
-            system_message_content=(
-                "You are a chatbot assistant, tasked with answering user queries "
-                "based on the provided context."
-            ),
-            conversation_history=[],
-            stream=False,
+        manager = st.session_state["azure_openai_client_4o"]
+        response = manager.get_azure_openai_client().chat.completions.create(
+            model=manager.chat_model_name,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You are a chatbot assistant, tasked with answering user queries "
+                        "based on the provided context."
+                    ),
+                },
+                {"role": "user", "content": prompt},
+            ],
+            stream=True,
             max_tokens=3000,
         )
+        for event in response:
+            if event.choices and event.choices[0].delta and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
 
         logger.info("AI response generated successfully.")
-        return response
     except Exception as e:
         logger.error(f"Error generating LLM response: {e}")
-        return "I'm sorry, but I encountered an error processing your request."
+        yield "I'm sorry, but I encountered an error processing your request."
 
 def store_response(
     query: str,
     response: str,
     context: List[str],
     sources: List[str],
-    collection: Collection
+    collection: Collection,
+    query_vector: Optional[List[float]] = None,
+    openai_manager: Optional[AzureOpenAIManager] = None,
+    embedding_cache: Optional[Collection] = None,
+    cache_index: Optional[dict] = None,
 ) -> None:
     """
     Store the user's query, the assistant's response,
     the embedding of the query, and references to source documents in MongoDB.
+
+    If the caller already embedded the query (the cache-lookup path does),
+    pass it as query_vector so we don't hit the embeddings API a second
+    time for the same text; otherwise openai_manager is needed for the
+    fallback embedding. This runs on worker threads, so everything it
+    touches comes in as an argument rather than from session state.
     """
     try:
+        if query_vector is None or len(query_vector) == 0:
+            query_vector = generate_embeddings(query, openai_manager, embedding_cache)
+        quantized = _quantize_embedding(query_vector)
         entry = {
             "query": query,
             "response": response,
             "context": context,
-            "queryVector": generate_embeddings(query),
+            # int8-quantized: ~4x smaller per entry than a float array.
+            "queryVector": quantized[0] if quantized else None,
+            "scale": quantized[1] if quantized else None,
             "sources": sources,
-            "created_at": time.time(),
+            "created_at": datetime.now(timezone.utc),
         }
         collection.insert_one(entry)
+        _append_cache_entry(cache_index, query_vector, response, sources)
         logger.info("Stored response in cache.")
     except Exception as e:
         logger.error(f"Error storing response: {e}")
 
+async def store_response_async(
+    query: str,
+    response: str,
+    context: List[str],
+    sources: List[str],
+    collection: Collection,
+    query_vector: Optional[List[float]] = None,
+    openai_manager: Optional[AzureOpenAIManager] = None,
+    embedding_cache: Optional[Collection] = None,
+    cache_index: Optional[dict] = None,
+) -> None:
+    """
+    Async wrapper around store_response. PyMongo is a synchronous driver,
+    so the insert runs in a worker thread to keep the event loop free
+    while the write (and any fallback embedding call) is in flight.
+    """
+    await asyncio.to_thread(
+        store_response, query, response, context, sources, collection, query_vector,
+        openai_manager, embedding_cache, cache_index,
+    )
+
 def search_cached_response(
     query: str,
     collection: Collection,
-    similarity_threshold: float
-) -> Optional[Tuple[Optional[str], Optional[List[str]]]]:
+    similarity_threshold: float,
+    openai_manager: AzureOpenAIManager,
+    embedding_cache: Optional[Collection],
+    cache_index: Optional[dict],
+) -> Tuple[Optional[str], Optional[List[str]], Optional[List[float]]]:
     """
-    Look in MongoDB to see if we've answered a similar query before.
+    Look in our response cache to see if we've answered a similar query before.
     Uses vector similarity to find the closest match, if any,
-    and returns (response, sources) if the similarity meets our threshold,
-    otherwise (None, None).
+    and returns (response, sources, query_embedding) if the similarity meets
+    our threshold, otherwise (None, None, query_embedding). The embedding is
+    always returned so the caller can reuse it (e.g. when storing a fresh
+    answer) instead of re-embedding the same query.
+
+    The similarity scan runs against the in-process mirror of the cache
+    (see _refresh_cache_index), so a lookup costs microseconds instead of
+    a MongoDB round-trip; the server-side $vectorSearch is only used as a
+    fallback when the mirror is unavailable.
     """
     try:
-        embedding = generate_embeddings(query)
+        query_vector = generate_embeddings(query, openai_manager, embedding_cache)
+        if query_vector.size == 0:
+            return None, None, None
+        embedding = query_vector
+
+        index = _refresh_cache_index(collection, cache_index)
+        if index is not None:
+            matrix = index["matrix"]
+            if matrix is None or not index["entries"]:
+                logger.info("No cached responses found.")
+                return None, None, embedding
+
+            query_norm = np.linalg.norm(query_vector)
+            if query_norm == 0.0:
+                return None, None, embedding
+
+            best, score = _best_cached_match(matrix, query_vector / query_norm)
+            if score >= similarity_threshold:
+                logger.info("Found a cached response in the local index.")
+                entry = index["entries"][best]
+                return entry["response"], entry["sources"], embedding
 
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "VectorSearchIndex",  # Index name in Mongo or Cosmos DB
-                    "path": "queryVector",
-                    "queryVector": embedding,
-                    "numCandidates": 5,
-                    "limit": 5,
-                }
-            },
-            {
-                "$project": {
-                    "similarityScore": {"$meta": "searchScore"},
-                    "response": 1,
-                    "sources": 1
-                }
-            },
-        ]
-        results = list(collection.aggregate(pipeline))
-        if not results:
-            logger.info("No cached responses found.")
-            return None, None
-
-        # Find the highest-scoring result
-        best_result = max(results, key=lambda x: x.get("similarityScore", 0.0))
-        if best_result.get("similarityScore", 0.0) >= similarity_threshold:
-            logger.info("Found a cached response with sufficient similarity.")
-            return best_result.get("response"), best_result.get("sources")
-        else:
             logger.info("No cached response met the similarity threshold.")
-            return None, None
+            return None, None, embedding
+
+        # The mirror could not be refreshed, which means MongoDB itself is
+        # unreachable — a server-side search would fail too (and quantized
+        # binary vectors are not rankable by $vectorSearch), so treat it as
+        # a cache miss.
+        logger.warning("Cache index unavailable; treating query as a cache miss.")
+        return None, None, embedding
 
     except Exception as e:
         logger.error(f"Error during cache search: {e}")
-        return None, None
+        return None, None, None
+
+@st.cache_resource(show_spinner=False)
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide long-lived event loop, creating it (and the
+    daemon thread that drives it) on first use. Keeping one loop alive
+    preserves connection pools, DNS caches, and TLS sessions across
+    turns instead of tearing them down on every message the way
+    asyncio.run does. cache_resource shares the loop across every
+    Streamlit session served by this process, not just the current one.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    logger.info("Started persistent event loop for this process.")
+    return loop
 
 def run_async(coro):
     """
-    We need a simple helper function for running async coroutines 
-    from a synchronous environment (i.e., inside Streamlit).
+    We need a simple helper function for running async coroutines
+    from a synchronous environment (i.e., inside Streamlit). Coroutines
+    are submitted to the session's persistent event loop rather than a
+    throwaway one.
     """
     try:
-        return asyncio.run(coro)
+        future = asyncio.run_coroutine_threadsafe(coro, _get_event_loop())
+        return future.result(timeout=60)
     except Exception as e:
         logger.error(f"Asyncio run failed: {e}")
         return "I'm sorry, I encountered an error processing your request."
 
-async def chatbot_logic(query: str) -> str:
+# In-flight cache writes scheduled by render_streamed_response; holding a
+# reference here keeps them from being garbage-collected mid-write.
+_pending_cache_writes = set()
+
+def _format_refs(sources: List[str]) -> str:
+    """
+    Render the numbered references block, listing each source once in
+    first-seen order. dict.fromkeys dedupes in C, and a single join
+    avoids the quadratic cost of repeated string concatenation.
+    """
+    unique = list(dict.fromkeys(sources))
+    return "\n\n**References:**\n" + "\n".join(
+        f"{i}. {src}" for i, src in enumerate(unique, start=1)
+    ) + "\n"
+
+async def chatbot_logic(
+    query: str,
+    collection: Collection,
+    search_client: SearchClient,
+    openai_manager: AzureOpenAIManager,
+    embedding_cache: Optional[Collection],
+    cache_index: Optional[dict],
+    enable_cache: bool = True,
+    similarity_threshold: float = 0.96,
+):
     """
     This function orchestrates the conversation:
       1. Check if we have a cached answer that's sufficiently similar to the new query.
-      2. If so, return that answer along with references.
-      3. If not, fetch documents from Azure Search, call the LLM,
-         store the new answer in our cache, and display references.
+      2. If so, return that answer along with references (as a string).
+      3. If not, fetch documents from Azure Search and return a plan dict
+         describing the streaming LLM call; chat_interface drives the
+         stream so tokens reach the UI as they are generated, then stores
+         the finished answer in our cache.
+
+    Every session-held object is an argument: this coroutine runs on the
+    event-loop thread, where Streamlit's session state resolves to an
+    empty mock, so the caller (on the script thread) must pass them in.
     """
-    start_time = time.time()
-    collection = st.session_state["cosmosdb_manager"]
-
-    # 1. Attempt to retrieve a cached answer if caching is enabled
-    if st.session_state.get("enable_cache", True):
-        similarity_threshold = st.session_state.get("similarity_threshold", 0.96)
-        cached_response, cached_sources = search_cached_response(query, collection, similarity_threshold)
+    # Monotonic clock for latency: immune to NTP adjustments and cheaper
+    # than wall-clock reads; only used for durations, never stored.
+    start_time = time.perf_counter_ns()
+
+    # The embedding computed during cache lookup is reused when storing a
+    # fresh answer, so a miss costs one embeddings call instead of two.
+    query_vector = None
+
+    # 1. Attempt to retrieve a cached answer if caching is enabled. The
+    # cache lookup and the Azure AI Search retrieval are independent I/O,
+    # so both are started at once: on a miss the documents are already in
+    # flight, and on a hit the search result is simply discarded. Both
+    # SDKs are synchronous, so each runs in a worker thread.
+    search_task = None
+    if enable_cache:
+        cache_task = asyncio.ensure_future(
+            asyncio.to_thread(
+                search_cached_response, query, collection, similarity_threshold,
+                openai_manager, embedding_cache, cache_index,
+            )
+        )
+        search_task = asyncio.ensure_future(
+            asyncio.to_thread(retrieve_documents_from_azure_ai_search, query, search_client)
+        )
+        cached_response, cached_sources, query_vector = await cache_task
         if cached_response:
-            duration = time.time() - start_time
-            references_str = "\n\n**References:**\n"
-            seen_sources = set()
-            for i, src in enumerate(cached_sources, start=1):
-                # Only list each source once
-                if src not in seen_sources:
-                    seen_sources.add(src)
-                    references_str += f"{i}. {src}\n"
+            # The HTTP call itself can't be interrupted mid-thread, but
+            # cancelling stops anything from waiting on its result.
+            search_task.cancel()
+            duration = (time.perf_counter_ns() - start_time) / 1e9
+            references_str = _format_refs(cached_sources)
 
             return (
                 f"🗄️ **(Cached Response in {duration:.2f}s)**\n\n{cached_response}"
                 f"{references_str}"
             )
 
-    # 2. If no suitable cache entry found, ask Azure AI Search for relevant docs
-    retrieved_docs = retrieve_documents_from_azure_ai_search(query)
+    # 2. No suitable cache entry: use the Azure AI Search docs (already in
+    # flight when caching is on).
+    if search_task is not None:
+        retrieved_docs = await search_task
+    else:
+        # Worker thread here too: this coroutine runs on the loop shared
+        # by every session, and a synchronous search call would stall all
+        # of them for a full round-trip.
+        retrieved_docs = await asyncio.to_thread(
+            retrieve_documents_from_azure_ai_search, query, search_client
+        )
     if not retrieved_docs:
         logger.warning("No documents retrieved from Azure AI Search.")
         return "I'm sorry, I couldn't retrieve any relevant documents to answer your query."
 
-    # Gather the chunk texts to pass as context
+    # Gather the chunk texts to pass as context, plus the doc sources for
+    # the references block
     context_texts = [doc["content"] for doc in retrieved_docs]
+    all_sources = [doc["metadata"] for doc in retrieved_docs]
 
-    # 3. Generate a response from Azure OpenAI
-    llm_response = await generate_llm_response(query, context_texts)
-    if not llm_response:
-        return "I'm sorry, I couldn't generate a response at this time."
+    # 3. Hand the streaming plan back to the UI layer; the LLM call itself
+    # runs there so tokens can be rendered as they arrive.
+    return {
+        "stream": True,
+        "query": query,
+        "context": context_texts,
+        "sources": all_sources,
+        "query_vector": query_vector,
+        "start_time": start_time,
+    }
+
+def render_streamed_response(plan: dict) -> str:
+    """
+    Drive the streaming LLM call for a cache miss: tokens are written to
+    the chat window as they arrive, then the references block is rendered
+    and the finished answer is stored in the cache. Returns the full
+    answer text for the chat history.
+    """
+    collection = st.session_state["cosmosdb_manager"]
 
-    duration = time.time() - start_time
+    streamed_text = st.write_stream(stream_llm_response(plan["query"], plan["context"]))
+    if not streamed_text:
+        return "I'm sorry, I couldn't generate a response at this time."
 
-    # 4. We'll store references so that the user can see the doc sources
-    all_sources = [doc["metadata"] for doc in retrieved_docs]
+    duration = (time.perf_counter_ns() - plan["start_time"]) / 1e9
+
+    # Save this brand-new response in the cache, reusing the embedding from
+    # the cache lookup when we have it. The write is fire-and-forget: it
+    # is not needed for this turn, so the UI doesn't wait on the insert.
+    # The pending set keeps a strong reference until the write finishes.
+    write = asyncio.run_coroutine_threadsafe(
+        store_response_async(
+            plan["query"],
+            streamed_text,
+            plan["context"],
+            plan["sources"],
+            collection,
+            query_vector=plan.get("query_vector"),
+            # Resolved here, on the script thread — the write itself runs
+            # where session state isn't visible.
+            openai_manager=st.session_state["azure_openai_client_4o"],
+            embedding_cache=st.session_state.get("embedding_cache_collection"),
+            cache_index=st.session_state.get("cache_index"),
+        ),
+        _get_event_loop(),
+    )
+    _pending_cache_writes.add(write)
+    write.add_done_callback(_pending_cache_writes.discard)
 
-    # Save this brand-new response in the cache
-    store_response(query, llm_response['response'], context_texts, all_sources, collection)
+    # Build a references block to display to the user
+    references_str = _format_refs(plan["sources"])
 
-    # 5. Build a references block to display to the user
-    references_str = "\n\n**References:**\n"
-    seen_sources = set()
-    for i, src in enumerate(all_sources, start=1):
-        if src not in seen_sources:
-            seen_sources.add(src)
-            references_str += f"{i}. {src}\n"
+    footer = f"{references_str}\n⏳ **(LLM Response in {duration:.2f}s)**"
+    st.markdown(footer, unsafe_allow_html=True)
 
-    final_answer = (
-        f"⏳ **(LLM Response in {duration:.2f}s)**\n\n{llm_response['response']}"
-        f"{references_str}"
-    )
-    return final_answer
+    return f"{streamed_text}{footer}"
 
 # ----------------------------- #
 #          UI Components        #
@@ -490,9 +958,27 @@ def chat_interface():
 
         # Then, let the AI generate a reply asynchronously
         with st.chat_message("assistant", avatar="🤖"):
-            response = run_async(chatbot_logic(user_query))
+            # Resolve everything chatbot_logic needs here, on the script
+            # thread — the coroutine itself runs on the event-loop thread
+            # and can't see session state.
+            result = run_async(chatbot_logic(
+                user_query,
+                collection=st.session_state["cosmosdb_manager"],
+                search_client=st.session_state["search_client"],
+                openai_manager=st.session_state["azure_openai_client_4o"],
+                embedding_cache=st.session_state.get("embedding_cache_collection"),
+                cache_index=st.session_state.get("cache_index"),
+                enable_cache=st.session_state.get("enable_cache", True),
+                similarity_threshold=st.session_state.get("similarity_threshold", 0.96),
+            ))
+            if isinstance(result, dict) and result.get("stream"):
+                # Cache miss: stream the LLM answer token by token
+                response = render_streamed_response(result)
+            else:
+                # Cached (or error) answer: already complete, render at once
+                response = result
+                st.markdown(response, unsafe_allow_html=True)
             st.session_state["chat_history"].append({"role": "assistant", "content": response})
-            st.markdown(response, unsafe_allow_html=True)
 
 # ----------------------------- #
 #            Main App           #